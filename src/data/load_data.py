@@ -1,19 +1,29 @@
 import pandas as pd
 import os
+from typing import Optional
 
-def load_data(file_path : str) -> pd.DataFrame:
+# Telco schema: TotalCharges has blank strings, so keep it as text and let
+# preprocessing coerce it to numeric
+TELCO_DTYPES = {
+    "customerID": "object",
+    "TotalCharges": "object",
+}
+
+def load_data(file_path : str, dtypes: Optional[dict] = None) -> pd.DataFrame:
     """
     Load data from a csv file into a pandas dataframe.
 
     Args:
         file_path (str): The path to the csv file.
-    
+        dtypes (dict, optional): Column dtypes to use instead of inferring them.
+            Defaults to the Telco schema (TELCO_DTYPES).
+
     Returns:
         pd.DataFrame: The loaded data as a pandas dataframe.
     """
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    
-    return pd.read_csv(file_path)
 
+    # pyarrow's multithreaded CSV reader is much faster than the default C engine
+    return pd.read_csv(file_path, engine="pyarrow", dtype=TELCO_DTYPES if dtypes is None else dtypes)
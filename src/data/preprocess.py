@@ -8,6 +8,7 @@ def preprocess_data(df : pd.DataFrame, target_col: str ="Churn") -> pd.DataFrame
     3. fix totalcharges to numeric
     4. map target churn to 0/1 if needed
     5. simple NA handling
+    6. downcast numeric columns (float32 / int8)
     """
     df.columns = df.columns.str.strip()
 
@@ -19,7 +20,8 @@ def preprocess_data(df : pd.DataFrame, target_col: str ="Churn") -> pd.DataFrame
 
     #target to 0/1 if its YES/NO
     if target_col in df.columns and df[target_col].dtype == "object":
-        df[target_col] = df[target_col].str.strip().map({"Yes":1, "No":0})
+        # vectorized string comparison instead of a per-row dict lookup (anything but "Yes" -> 0)
+        df[target_col] = df[target_col].str.strip().eq("Yes").astype("int8")
 
     #totalcharges often has blanks in this dataset ->coerce to float
     if "TotalCharges" in df.columns:
@@ -33,8 +35,20 @@ def preprocess_data(df : pd.DataFrame, target_col: str ="Churn") -> pd.DataFrame
     # -numeirc cols -> fillna with 0
     # - others: leave for encoders to handle (get_dummies ignores NaN safely)
 
-    num_cols = df.select_dtypes(include=["number"]).columns #number includes both int64 and float64
+    # read dtypes once and build column masks from them instead of repeated select_dtypes calls
+    dtypes = df.dtypes
+    num_mask = dtypes.map(lambda d: pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d))
+    float_mask = dtypes.map(pd.api.types.is_float_dtype)
+
+    num_cols = df.columns[num_mask] #number includes both int64 and float64
     df[num_cols] = df[num_cols].fillna(0)
 
+    #downcast numerics -> float64 to float32, SeniorCitizen to int8
+    # (xgboost works in float32 internally, so this halves memory traffic at no accuracy cost)
+    for c in df.columns[float_mask]:
+        df[c] = pd.to_numeric(df[c], downcast="float")
+    if "SeniorCitizen" in df.columns:
+        df["SeniorCitizen"] = df["SeniorCitizen"].astype("int8")
+
     return df 
     
\ No newline at end of file
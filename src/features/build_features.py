@@ -1,101 +1,111 @@
+import numpy as np
 import pandas as pd
+from typing import Tuple
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder
+from src.data.preprocess import preprocess_data
 
-#_ this in the beginning of the function name to indicate it's private 
+#_ this in the beginning of the function name to indicate it's private
 # function and will be used only inside this module
 
-# s is expected to be a pandas series like column of a dataframe
-def _map_binary_series(s: pd.Series) -> pd.Series: 
+def _split_by_cardinality(df: pd.DataFrame, obj_cols: list) -> tuple:
     """
-    Apply deterministic binary encoding to 2-category features.
-    
-    This function implements the core binary encoding logic that converts
-    categorical features with exactly 2 values into 0/1 integers. The mappings
-    are deterministic and must be consistent between training and serving.
+    Split categorical columns into binary (2 categories) and multi-category (>2) columns.
+    """
+    # nunique is computed once for all categorical columns instead of per-column twice
+    card = df[obj_cols].nunique(dropna=True)
+    return card.index[card==2].tolist(), card.index[card>2].tolist()
+
+def _as_float32(X):
+    """
+    Cast passthrough numeric columns to float32 so the stacked feature matrix is
+    float32 as a whole (no float64 upcast that has to be copied down afterwards).
+    """
+    return X.astype(np.float32)
+
+def build_feature_pipeline(binary_cols: list, multi_cat_cols: list, numeric_cols: list) -> Pipeline:
+    """
+    Build the (unfitted) sklearn feature pipeline shared by training and serving.
 
+    preprocess_data followed by one-hot encoding with drop="first" for multi-category
+    columns and deterministic 0/1 encoding for binary columns (OrdinalEncoder sorts the
+    categories, so No/Yes and Female/Male map to 0/1). numeric_cols pass through as
+    float32; any other column (e.g. the target) is dropped, so callers never need to
+    copy the frame just to remove the target.
+    The fitted pipeline is persisted so serving runs pipe.transform(df) in one shot.
+
+    Training does not fit the preproc step on data: its input is already preprocessed
+    (see build_features), so preprocess_data only ever runs once per row.
     """
-    # Get unique values and remove NaN
-    # below line of code is use to extract unique non-null values from the series s
-    vals = list(pd.Series(s.dropna().unique()).astype(str))
-    valset = set(vals)
-
-    if valset == {"Yes", "No"}:
-        return s.map({"Yes": 1, "No": 0}).astype("Int64")  
-    
-    if valset == {"Male", "Female"}:
-        return s.map({"Male": 1,"Female": 0}).astype("Int64")
-    
-    # ==== Generic binary mapping ====
-    # For any other 2-category feature, use stable alphabetical ordering
-    if len(vals) == 2:
-        sorted_vals = sorted(vals)
-        mapping = {sorted_vals[1]: 1, sorted_vals[0]: 0}
-        return s.map(mapping).astype("Int64")
-    
-     # === NON-BINARY FEATURES ===
-    # Return unchanged - will be handled by one-hot encoding
-    return s
-
-def build_features(df: pd.DataFrame, target_col: str = "Churn") -> pd.DataFrame:
+    encode = ColumnTransformer(
+        [
+            # dense float32 block: xgboost densifies pandas sparse input anyway, and treats
+            # values absent from a CSR matrix as missing (not 0), which serving would not match
+            ("cat", OneHotEncoder(drop="first", sparse_output=False, dtype=np.float32,
+                                  handle_unknown="ignore"), multi_cat_cols),
+            ("bin", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan,
+                                   dtype=np.float32), binary_cols),
+            ("num", FunctionTransformer(_as_float32, feature_names_out="one-to-one"), numeric_cols),
+        ],
+        remainder="drop",
+        verbose_feature_names_out=False,
+    )
+    return Pipeline([("preproc", FunctionTransformer(preprocess_data)), ("encode", encode)])
+
+def build_features(df: pd.DataFrame, target_col: str = "Churn") -> Tuple[pd.DataFrame, Pipeline]:
     """
     Apply complete feature engineering pipeline for training data.
-    
-    This is the main feature engineering function that transforms raw customer data
-    into ML-ready features. The transformations must be exactly replicated in the
-    serving pipeline to ensure prediction accuracy.
 
+    This is the main feature engineering function that transforms preprocessed customer
+    data into ML-ready features. It fits the same sklearn pipeline that is persisted for
+    serving and trains on its output, so training and serving share one set of encoders.
+
+    df must already be the output of preprocess_data. Only the pipeline's encode step is
+    fitted on it; the stateless preproc step is fitted on zero rows just to record the
+    input columns, so preprocessing is not run a second time here. Serving (raw input)
+    goes through both steps via pipe.transform.
+
+    Returns the encoded dataframe (features + target) and the fitted pipeline.
     """
 
-    df = df.copy()
     print(f"🔧 Starting feature engineering on {df.shape[1]} columns...")
 
     # === STEP 1: Identify Feature Types ===
     # Find categorical columns (object dtype) excluding the target variable
 
-    obj_cols = [col for col in df.select_dtypes(include=["object"]).columns if col!= target_col]
-    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+    # read dtypes once and build column masks from them instead of repeated select_dtypes calls
+    dtypes = df.dtypes
+    obj_mask = dtypes == "object"
+    num_mask = dtypes.map(pd.api.types.is_numeric_dtype) # includes bool columns, passed through as 0/1
+
+    obj_cols = [col for col in df.columns[obj_mask] if col!= target_col]
+    numeric_cols = [col for col in df.columns[num_mask] if col!= target_col]
     print(f"   📊 Found {len(obj_cols)} categorical and {len(numeric_cols)} numeric columns")
 
     # === STEP 2: split columns by cardinality(number of categories) ===
     # binary columns: get binary encoding
     # multi-category columns: one-hot encoding
-    binary_cols = [c for c in obj_cols if df[c].nunique()==2]
-    multi_cat_cols = [c for c in obj_cols if df[c].nunique()>2]
+    binary_cols, multi_cat_cols = _split_by_cardinality(df, obj_cols)
 
     print(f"   🔢 {len(binary_cols)} binary and {len(multi_cat_cols)} multi-category features identified")
 
-    # === STEP 3: Apply Binary Encoding ===
-    # convert binary categorical columns to 0/1 using deterministic mapping
-    for col in binary_cols:
-        original_dtype = df[col].dtype
-        df[col] = _map_binary_series(df[col].astype(str))
-        print(f"      - Binary encoded column '{col}' from {original_dtype} to {df[col].dtype}")
-
-    
-    # === STEP 4: Convert boolean columsn ===
-    bool_cols = df.select_dtypes(include=["bool"]).columns.tolist()
-
-    if bool_cols:
-        df[bool_cols] = df[bool_cols].astype("Int64")
-        print(f"   ✅ Converted {len(bool_cols)} boolean columns to Int64")
-
-    # === STEP 5: One-Hot Encoding for Multi-Category Features ===
-    if multi_cat_cols:
-        print(f"   🏷️ Applying one-hot encoding to {len(multi_cat_cols)} multi-category features...")
-        original_shape = df.shape
-        df = pd.get_dummies(df, columns=multi_cat_cols, drop_first=True)
-
-        new_features = df.shape[1]-original_shape[1] + len(multi_cat_cols)
-        print(f"      - One-hot encoding added {new_features} new features. New shape: {df.shape}")
-
-    
-    # === STEP 6: DATA TYPE CLEANING ===
-    # Ensure all numeric columns are of type float64 or Int64
-    for c in binary_cols:
-        if pd.api.types.is_integer_dtype(df[c]):
-            # fill na value with 0 before converting to Int64
-            df[c] = df[c].fillna(0).astype("Int64")
-    
-    print(f"✅ Feature engineering complete: {df.shape[1]} final features")
-    return df
-
-
+    # === STEP 3: Fit the feature pipeline and encode ===
+    # the encoder selects feature columns itself, so df is used as-is (no copy to drop the target)
+    pipe = build_feature_pipeline(binary_cols, multi_cat_cols, numeric_cols)
+    pipe.named_steps["preproc"].fit(df.iloc[:0].drop(columns=[target_col]))
+    X = pipe.named_steps["encode"].fit_transform(df)
+
+    # every block is float32 (what xgboost uses internally), so this wraps X without a copy
+    df_enc = pd.DataFrame(
+        X,
+        columns=pipe[-1].get_feature_names_out(),
+        index=df.index,
+    )
+    df_enc[target_col] = df[target_col].to_numpy()
+
+    new_features = df_enc.shape[1] - df.shape[1] + len(multi_cat_cols)
+    print(f"      - One-hot encoding added {new_features} new features for {len(multi_cat_cols)} multi-category columns")
+
+    print(f"✅ Feature engineering complete: {df_enc.shape[1]} final features")
+    return df_enc, pipe
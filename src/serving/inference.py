@@ -25,6 +25,8 @@ Production Deployment:
 """
 
 import os
+import joblib
+import numpy as np
 import pandas as pd
 import mlflow
 
@@ -67,6 +69,18 @@ try:
 except Exception as e:
     raise Exception(f"Failed to load feature columns: {e}")
 
+# === FEATURE PIPELINE LOADING ===
+# Fitted sklearn feature pipeline (preprocessing + encoders) saved by training.
+# Older artifacts only carry the feature column list - fall back to _serve_transform then
+try:
+    preprocessing = joblib.load(os.path.join(MODEL_DIR, "preprocessing.pkl"))
+    FEATURE_PIPELINE = preprocessing.get("pipeline")
+except Exception as e:
+    print(f"⚠️ Could not load preprocessing pipeline: {e}")
+    FEATURE_PIPELINE = None
+if FEATURE_PIPELINE is not None:
+    print("✅ Loaded fitted feature pipeline from training")
+
 # === FEATURE TRANSFORMATION CONSTANTS ===
 # CRITICAL: These mappings must exactly match those used in training
 # Any changes here will cause train/serve skew and degrade model performance
@@ -145,9 +159,10 @@ def _serve_transform(df: pd.DataFrame) -> pd.DataFrame:
     
     # === STEP 4: Boolean to Integer Conversion ===
     # Convert any boolean columns to integers (XGBoost compatibility)
+    # Single bulk cast to int8 - 8x smaller than int64 and still valid XGBoost input
     bool_cols = df.select_dtypes(include=["bool"]).columns
     if len(bool_cols) > 0:
-        df[bool_cols] = df[bool_cols].astype(int)
+        df[bool_cols] = df[bool_cols].astype(np.int8)
     
     # === STEP 5: Feature Alignment with Training Schema ===
     # CRITICAL: Ensure features are in exact same order as training
@@ -156,6 +171,20 @@ def _serve_transform(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
+def _pipeline_transform(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Transform raw customer data with the fitted training feature pipeline.
+
+    Input is aligned with the columns the pipeline was fitted on: missing ones
+    (e.g. SeniorCitizen) are filled with 0 and extra ones (e.g. customerID, which
+    preprocessing drops before fitting) are discarded. The output is aligned with
+    the training feature order.
+    """
+    df = df.reindex(columns=FEATURE_PIPELINE.feature_names_in_, fill_value=0)
+    X = FEATURE_PIPELINE.transform(df)
+    df = pd.DataFrame(X, columns=FEATURE_PIPELINE[-1].get_feature_names_out(), index=df.index)
+    return df.reindex(columns=FEATURE_COLS, fill_value=0)
+
 def predict(input_dict: dict) -> str:
     """
     Main prediction function for customer churn inference.
@@ -194,7 +223,10 @@ def predict(input_dict: dict) -> str:
     
     # === STEP 2: Apply Feature Transformations ===
     # Use the same transformation pipeline as training
-    df_enc = _serve_transform(df)
+    if FEATURE_PIPELINE is not None:
+        df_enc = _pipeline_transform(df)
+    else:
+        df_enc = _serve_transform(df)
     
     # === STEP 3: Generate Model Prediction ===
     # Call the loaded MLflow model for inference